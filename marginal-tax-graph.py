@@ -1,6 +1,7 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
+import bisect
 
 # --- 2026 TAX DATA (OBBB Rules) ---
 # DATA_2026 stores all tax bracket and deduction info for each filing status
@@ -9,9 +10,10 @@ import numpy as np
 #  - ord: ordinary income brackets (income range, top, marginal rate)
 #  - ltcg: long-term capital gains brackets (same structure)
 #  - ss_t: social security income taxation thresholds
+#  - ss_cap: cap on SS taxed at 50% once provisional income passes the upper threshold
 #  - phaseout_start: where senior deduction starts to phase out
 #  - niit: Net Investment Income Tax threshold
-#  - irmaa: IRMAA (Medicare premium) thresholds
+#  - irmaa: IRMAA (Medicare premium) thresholds, in ascending order
 DATA_2026 = {
     "Single": {
         "std": 16100, 
@@ -20,6 +22,7 @@ DATA_2026 = {
                 (201775, 256225, 32), (256225, 640600, 35), (640600, 9e9, 37)],
         "ltcg": [(0, 49450, 0), (49450, 545500, 15), (545500, 9e9, 20)],
         "ss_t": (25000, 34000), 
+        "ss_cap": 4500,
         "phaseout_start": 75000, 
         "niit": 200000, 
         "irmaa": [109000, 136000, 170000, 204000, 500000]
@@ -31,12 +34,42 @@ DATA_2026 = {
                 (403550, 512450, 32), (512450, 768700, 35), (768700, 9e9, 37)],
         "ltcg": [(0, 98900, 0), (98900, 613700, 15), (613700, 9e9, 20)],
         "ss_t": (32000, 44000),
+        "ss_cap": 6000,
         "phaseout_start": 150000,
         "niit": 250000, 
         "irmaa": [218000, 272000, 340000, 408000, 750000]
     }
 }
 
+# --- BRACKET ARRAYS ---
+# BRACKETS holds each bracket schedule as (lows, highs, rates, base) float
+# arrays, built once at import so the tax functions never walk the tuple lists.
+# Rates are stored as fractions (e.g. 0.22), not percentages, and base[i] is
+# the tax already owed at lows[i] (the sum of all lower brackets).
+# Dollar amounts (get_tax_details, the sidebar metrics) are computed in
+# float64. The plot sweep only needs marginal rates and segment edges, so it
+# runs in DTYPE against SWEEP_BRACKETS, a float32 copy of the same arrays, at
+# half the memory traffic.
+DTYPE = np.float32
+
+def _bracket_arrays(brackets, dtype=np.float64):
+    lows, highs, rates = np.array(brackets, dtype=dtype).T
+    # The top bracket's 9e9 "high" stands in for no limit. Make it a real +inf
+    # so searchsorted never returns len(highs), however large the input.
+    highs[-1] = np.inf
+    rates = rates / 100.0
+    base = np.concatenate(([0.0], np.cumsum((highs - lows) * rates)[:-1])).astype(dtype)
+    return lows, highs, rates, base
+
+BRACKETS = {
+    status: {"ord": _bracket_arrays(c["ord"]), "ltcg": _bracket_arrays(c["ltcg"])}
+    for status, c in DATA_2026.items()
+}
+SWEEP_BRACKETS = {
+    status: {"ord": _bracket_arrays(c["ord"], DTYPE), "ltcg": _bracket_arrays(c["ltcg"], DTYPE)}
+    for status, c in DATA_2026.items()
+}
+
 # --- CALLBACK TO SYNC SIDEBAR ---
 def update_defaults():
     # Called whenever the filing status changes.
@@ -50,64 +83,240 @@ def update_defaults():
 if "wages" not in st.session_state:
     st.session_state["wages"] = 50000.0
 
-# --- TAX CALCULATION FUNCTION ---
+# --- TAX CALCULATION FUNCTIONS ---
+def _taxable_ss(prov, ss, t1, t2, ss_cap):
+    # Taxable portion of SS for the given provisional income, evaluated
+    # branch-free: both tiers are computed and np.select picks per element
+    tier_85 = np.minimum(0.85 * ss, (prov - t2) * 0.85 + min(ss_cap, 0.5 * ss))
+    tier_50 = np.minimum(0.5 * ss, (prov - t1) * 0.5)
+    return np.select([prov > t2, prov > t1], [tier_85, tier_50], default=0.0)
+
+def _schedule_tax(t, lows, highs, rates, base):
+    # Tax owed on taxable amount t (>= 0) under one bracket schedule: the
+    # precomputed tax below t's bracket plus t's share of that bracket
+    i = np.searchsorted(highs, t, side="right")
+    return base[i] + (t - lows[i]) * rates[i]
+
+def _tax_kernel(wages, ltcg, ss, std, senior_ded, ord_lows, ord_highs, ord_rates, ord_base,
+                ltcg_lows, ltcg_highs, ltcg_rates, ltcg_base, t1, t2, phaseout, niit_thr, ss_cap):
+    # Purely numeric core of get_tax_details: scalars and float arrays only,
+    # with the filing status and age already resolved by get_tax_details.
+    # 6% phase-out of the senior deduction above the threshold
+    # (non-seniors get senior_ded = 0, so this is always 0 for them)
+    phase_out = np.maximum(0, (wages + ltcg - phaseout) * 0.06)
+    sd_used = np.maximum(0, senior_ded - phase_out)
+    
+    deduction = std + sd_used  # total deduction
+    prov = wages + ltcg + (0.5 * ss)  # provisional income for SS taxation
+    taxable_ss = _taxable_ss(prov, ss, t1, t2, ss_cap)
+    
+    t_ord_inc = np.maximum(0, (wages + taxable_ss) - deduction)  # taxed as ordinary income
+    ord_tax = _schedule_tax(t_ord_inc, ord_lows, ord_highs, ord_rates, ord_base)
+    current_ord_rate = np.where(t_ord_inc > 0, ord_rates[np.searchsorted(ord_highs, t_ord_inc)] * 100, 0)
+    
+    t_total = np.maximum(0, (wages + taxable_ss + ltcg) - deduction)
+    l_portion = np.maximum(0, t_total - t_ord_inc)  # amount taxed as LTCG
+    l_top = t_ord_inc + l_portion  # LTCG stacks on top of ordinary income
+    # LTCG tax is the schedule's tax at the top of the stack minus at its bottom
+    ltcg_sched = (ltcg_lows, ltcg_highs, ltcg_rates, ltcg_base)
+    l_tax = _schedule_tax(l_top, *ltcg_sched) - _schedule_tax(t_ord_inc, *ltcg_sched)
+    current_ltcg_rate = np.where(l_top > 0, ltcg_rates[np.searchsorted(ltcg_highs, l_top)] * 100, 0)
+    
+    niit = np.maximum(0, (wages + ltcg - niit_thr) * 0.038)  # Net Investment Income Tax if above threshold
+    return ord_tax, l_tax, niit, taxable_ss, current_ord_rate, current_ltcg_rate, sd_used
+
 def get_tax_details(wages, ltcg, ss, status, senior):
     """
     Compute all derived tax details for a given scenario.
 
+    Vectorized over wages: pass a scalar for a single scenario or a NumPy
+    array to evaluate a whole income sweep in one call.
+
     Args:
-        wages (float): Earned ordinary income
+        wages (float or np.ndarray): Earned ordinary income
         ltcg (float): Long term capital gains
         ss (float): Social Security annual income
         status (str): Filing status ("Single" or "Married Filing Jointly")
         senior (bool): Whether taxpayer is 65 or older
 
     Returns:
-        ord_tax (float): Tax on ordinary income
-        l_tax (float): Tax on long-term capital gains
-        niit (float): Net Investment Income Tax
-        taxable_ss (float): Taxable portion of SS
-        current_ord_rate (float): Top ordinary marginal rate
-        current_ltcg_rate (float): Top LTCG marginal rate
-        sd_used (float): Senior deduction claimed
+        ord_tax (np.ndarray): Tax on ordinary income
+        l_tax (np.ndarray): Tax on long-term capital gains
+        niit (np.ndarray): Net Investment Income Tax
+        taxable_ss (np.ndarray): Taxable portion of SS
+        current_ord_rate (np.ndarray): Top ordinary marginal rate
+        current_ltcg_rate (np.ndarray): Top LTCG marginal rate
+        sd_used (np.ndarray): Senior deduction claimed
     """
     c = DATA_2026[status]
+    t1, t2 = c["ss_t"]
+    return _tax_kernel(
+        np.asarray(wages, dtype=np.float64), ltcg, ss, c["std"], c["senior_deduction"] if senior else 0,
+        *BRACKETS[status]["ord"], *BRACKETS[status]["ltcg"],
+        t1, t2, c["phaseout_start"], c["niit"], c["ss_cap"]
+    )
 
-    sd_used = 0
-    if senior:
-        # 6% phase-out of the senior deduction above the threshold
-        phase_out = max(0, (wages + ltcg - c["phaseout_start"]) * 0.06)
-        sd_used = max(0, c["senior_deduction"] - phase_out)
-    
-    deduction = c["std"] + sd_used  # total deduction
-    prov = wages + ltcg + (0.5 * ss)  # provisional income for SS taxation
+# --- MARGINAL RATE FUNCTION ---
+def tax_and_marginals(wages, ltcg, ss, status, senior):
+    """
+    Compute the marginal tax rate components analytically in a single pass.
+
+    Tax is piecewise-linear in wages, so the marginal rate is the slope of the
+    segment just above each income: the rate of the containing bracket plus
+    the known SS phase-in, senior phase-out and NIIT slopes. Only the
+    quantities the slopes need are computed; the tax amounts themselves
+    (bracket overlaps) are skipped.
+
+    Args:
+        wages (float or np.ndarray): Earned ordinary income
+        ltcg (float): Long term capital gains
+        ss (float): Social Security annual income
+        status (str): Filing status ("Single" or "Married Filing Jointly")
+        senior (bool): Whether taxpayer is 65 or older
+
+    Returns:
+        ord_m (np.ndarray): Ordinary income marginal rate (%)
+        ltcg_m (np.ndarray): Marginal rate from LTCG pushed into higher brackets (%)
+        ss_m (np.ndarray): Marginal rate from newly taxable SS (%)
+        senior_m (np.ndarray): Marginal rate from the senior deduction phase-out (%)
+        niit_m (np.ndarray): Marginal NIIT rate (%)
+        total_m (np.ndarray): Total marginal tax rate (%)
+    """
+    c = DATA_2026[status]
+    wages = np.asarray(wages, dtype=DTYPE)
+    _, ord_highs, ord_rates, _ = SWEEP_BRACKETS[status]["ord"]
+    _, ltcg_highs, ltcg_rates, _ = SWEEP_BRACKETS[status]["ltcg"]
+
+    # Senior deduction (0 for non-seniors), and the 6 cents of it lost per
+    # dollar inside the phase-out band
+    senior_ded = c["senior_deduction"] if senior else 0
+    phase_out = np.maximum(0, (wages + ltcg - c["phaseout_start"]) * 0.06)
+    sd_used = np.maximum(0, senior_ded - phase_out)
+    phase_slope = np.where((wages + ltcg >= c["phaseout_start"]) & (sd_used > 0), 0.06, 0)
+
+    # Taxable SS and its slope with respect to income: 0.5 or 0.85 until the cap is reached
+    prov = wages + ltcg + (0.5 * ss)
     t1, t2 = c["ss_t"]
-    taxable_ss = 0
-    if prov > t2: 
-        taxable_ss = min(0.85 * ss, (prov - t2) * 0.85 + min(6000 if status == "Married Filing Jointly" else 4500, 0.5 * ss))
-    elif prov > t1: 
-        taxable_ss = min(0.5 * ss, (prov - t1) * 0.5)
-    
-    t_ord_inc = max(0, (wages + taxable_ss) - deduction)  # taxed as ordinary income
-    ord_tax = 0
-    current_ord_rate = 0
-    for low, high, rate in c["ord"]:
-        if t_ord_inc > low:
-            ord_tax += (min(t_ord_inc, high) - low) * (rate / 100)
-            current_ord_rate = rate
-    
-    t_total = max(0, (wages + taxable_ss + ltcg) - deduction)
-    l_portion = max(0, t_total - t_ord_inc)  # amount taxed as LTCG
-    l_tax = 0
-    current_ltcg_rate = 0
-    for low, high, rate in c["ltcg"]:
-        overlap = max(0, min(t_ord_inc + l_portion, high) - max(t_ord_inc, low))
-        l_tax += overlap * (rate / 100)
-        if (t_ord_inc + l_portion) > low:
-            current_ltcg_rate = rate
-    
-    niit = max(0, (wages + ltcg - c["niit"]) * 0.038)  # Net Investment Income Tax if above threshold
-    return ord_tax, l_tax, niit, taxable_ss, current_ord_rate, current_ltcg_rate, sd_used
+    taxable_ss = _taxable_ss(prov, ss, t1, t2, c["ss_cap"])
+    ss_slope = np.select(
+        [prov >= t2, prov >= t1],
+        [np.where(taxable_ss < 0.85 * ss, 0.85, 0), np.where(taxable_ss < 0.5 * ss, 0.5, 0)],
+        default=0.0
+    )
+    inc_slope = 1 + ss_slope + phase_slope  # change in taxable income per dollar
+
+    deduction = c["std"] + sd_used
+    t_ord_raw = (wages + taxable_ss) - deduction
+    # Top of the LTCG stack, as in _tax_kernel: a capital loss (ltcg < 0)
+    # leaves no LTCG portion, so the top never drops below ordinary income
+    t_top_raw = np.maximum(t_ord_raw + ltcg, t_ord_raw)
+    ord_on = t_ord_raw >= 0  # whether taxable income moves with wages
+    top_on = t_top_raw >= 0
+    t_ord_inc = np.maximum(0, t_ord_raw)
+    l_top = np.maximum(0, t_top_raw)
+
+    # Rates (%) of the brackets containing the segment just above each point
+    br = ord_rates[np.searchsorted(ord_highs, t_ord_inc, side="right")] * 100 * ord_on
+    lr_top = ltcg_rates[np.searchsorted(ltcg_highs, l_top, side="right")] * 100 * top_on
+    lr_bottom = ltcg_rates[np.searchsorted(ltcg_highs, t_ord_inc, side="right")] * 100 * ord_on
+
+    ord_m = br
+    ss_m = br * ss_slope  # impact of SS portion
+    senior_m = br * phase_slope  # marginal senior deduction loss
+    ltcg_m = (lr_top - lr_bottom) * inc_slope  # LTCG stack pushed up by ordinary income
+    niit_m = np.where(wages + ltcg >= c["niit"], 3.8, 0)  # marginal NIIT rate
+    total_m = ord_m + ltcg_m + ss_m + senior_m + niit_m
+    return ord_m, ltcg_m, ss_m, senior_m, niit_m, total_m
+
+# --- MARGINAL RATE SWEEP ---
+@st.cache_data(max_entries=256)
+def transition_points(status, ltcg, ss, senior):
+    """
+    Find every income at which a marginal rate component can change.
+
+    Tax is piecewise-linear in wages, so the marginal rate is constant
+    between these points. They don't depend on the plotted range, so results
+    are cached and reused when only the wages cursor moves. This uses
+    st.cache_data rather than functools.lru_cache: Streamlit re-executes the
+    script on every rerun, which would start each run with an empty lru_cache.
+
+    Args:
+        status (str): Filing status ("Single" or "Married Filing Jointly")
+        ltcg (float): Long term capital gains
+        ss (float): Social Security annual income
+        senior (bool): Whether taxpayer is 65 or older
+
+    Returns:
+        np.ndarray: Sorted, unique transition incomes (>= 0)
+    """
+    c = DATA_2026[status]
+    t1, t2 = c["ss_t"]
+    base = ltcg + 0.5 * ss  # provisional income = wages + base
+
+    # Kinks in the wages -> taxable income mapping, known directly in wages:
+    # SS taxation tiers and where each tier hits its cap, senior phase-out, NIIT
+    kinks = [
+        t1 - base, t1 + ss - base,
+        t2 - base, t2 + (0.85 * ss - min(c["ss_cap"], 0.5 * ss)) / 0.85 - base,
+        c["niit"] - ltcg,
+    ]
+    if senior:
+        kinks += [c["phaseout_start"] - ltcg, c["phaseout_start"] + c["senior_deduction"] / 0.06 - ltcg]
+    knots = np.unique(np.concatenate(([0.0], kinks)))
+    knots = knots[knots >= 0]
+
+    # Between knots taxable income is linear in wages, so bracket edges can be
+    # mapped back to wages by interpolation. Past the last knot the slope is 1.
+    _, _, _, taxable_ss, _, _, sd_used = get_tax_details(knots, ltcg, ss, status, senior)
+    t_ord_raw = knots + taxable_ss - (c["std"] + sd_used)
+
+    def to_wages(t_raw, targets):
+        beyond = knots[-1] + (targets - t_raw[-1])
+        return np.where(targets > t_raw[-1], beyond, np.interp(targets, t_raw, knots))
+
+    ord_edges = np.concatenate(([0.0], BRACKETS[status]["ord"][1][:-1]))
+    ltcg_edges = np.concatenate(([0.0], BRACKETS[status]["ltcg"][1][:-1]))
+    points = np.concatenate((
+        knots,
+        to_wages(t_ord_raw, ord_edges),  # ordinary brackets
+        to_wages(t_ord_raw, ltcg_edges),  # bottom of the LTCG stack
+        to_wages(t_ord_raw + max(ltcg, 0), ltcg_edges),  # top of the LTCG stack (no stack for a loss)
+    ))
+    return np.unique(points[points >= 0])
+
+@st.cache_data(max_entries=256)
+def sweep(status, ltcg, ss, senior, max_x):
+    """
+    Compute the stacked marginal rate components across the plotted income range.
+
+    Cached on its inputs, so reruns triggered by widgets that don't affect the
+    tax math (e.g. the IRMAA toggle) skip the computation entirely. max_x is
+    a float derived from wages, so the cache is bounded to keep it from
+    growing with every distinct income entered.
+
+    The marginal rate is constant between transition points, so each segment
+    is evaluated once at its midpoint and drawn with three samples (start,
+    middle, end). Neighbouring segments share an x, giving vertical steps.
+
+    Returns:
+        x_range (np.ndarray): Incomes sampled for the plot
+        stack_arr (np.ndarray): (5, N) ordinary, LTCG, SS, senior phase-out and NIIT marginal rates
+        total_m_rates (np.ndarray): Total marginal tax rate at each point
+    """
+    edges = transition_points(status, ltcg, ss, senior)
+    edges = np.unique(np.concatenate(([0.0], edges[edges < max_x], [max_x])).astype(DTYPE))
+    starts, ends = edges[:-1], edges[1:]
+    mids = (starts + ends) / 2
+    x_range = np.column_stack((starts, mids, ends)).ravel()
+
+    # Preallocate the stacked components plus the total as one (6, N) array
+    # and copy each segment's rates into its three sample columns in place
+    seg_rates = tax_and_marginals(mids, ltcg, ss, status, senior)
+    rates = np.empty((6, len(x_range)), dtype=DTYPE)
+    for k in range(3):
+        rates[:, k::3] = seg_rates
+    stack_arr, total_m_rates = rates[:5], rates[5]
+    return x_range, stack_arr, total_m_rates
 
 # --- STREAMLIT APP CONFIGURATION ---
 st.set_page_config(page_title="2026 Tax Analyzer", layout="wide")
@@ -159,53 +368,32 @@ st.sidebar.write(f"**Capital Gains Effective Rate:** {((l_f + n_f)/ltcg_input*10
 # --- DATA GENERATION FOR PLOT ---
 # Determine X range for plotting
 max_x = max(wages * 1.5, 100000)  # set x-axis maximum
-x_range = np.linspace(0, max_x, 800)  # points to plot, covers wide income span
-delta = 1.0  # increment to calculate marginal rates
-stack_data = []  # all stacked marginal contributions for plotting
-total_m_rates = []  # total marginal tax rates at each point
-
-# For each possible income, calculate marginal tax components for stacking
-for x in x_range:
-    o1, l1, n1, ss1, br1, lr1, sd1 = get_tax_details(x, ltcg_input, ss_income, st_status, is_senior)
-    o2, l2, n2, ss2, br2, lr2, sd2 = get_tax_details(x + delta, ltcg_input, ss_income, st_status, is_senior)
-    
-    # Total marginal rate: difference in total tax
-    total_m = ((o2 + l2 + n2) - (o1 + l1 + n1)) / delta * 100
-    # Specific components
-    niit_m = (n2 - n1) / delta * 100  # marginal NIIT rate
-    ss_m = ((ss2 - ss1) / delta) * (br1 / 100) * 100  # impact of SS portion
-    ltcg_m = (l2 - l1) / delta * 100  # marginal LTCG rate
-    senior_m = ((sd1 - sd2) * (br1 / 100)) / delta * 100 if is_senior else 0  # marginal senior deduction loss
-    ord_m = max(0, total_m - niit_m - ss_m - ltcg_m - senior_m)  # remainder is ordinary marginal rate
-    
-    stack_data.append((ord_m, ltcg_m, ss_m, senior_m, niit_m))
-    total_m_rates.append(total_m)
+x_range, stack_arr, total_m_rates = sweep(st_status, ltcg_input, ss_income, is_senior, max_x)
 
 # --- PLOTTING ---
 fig, ax = plt.subplots(figsize=(12, 6))
 
-# Stackplot: colors for each component
-ax.stackplot(
-    x_range, *zip(*stack_data), 
-    labels=['Ordinary', 'Capital Gains', 'Social Security', 'Senior Phase-out', 'NIIT'], 
-    colors=['#4CAF50', '#2196F3', '#F44336', '#FFEB3B', '#FF9800'], alpha=0.8
-)
+# Stacked areas: cumulate the components once, then fill each band between
+# the running total below it and the one above
+cum = np.cumsum(stack_arr, axis=0)
+labels = ['Ordinary', 'Capital Gains', 'Social Security', 'Senior Phase-out', 'NIIT']
+colors = ['#4CAF50', '#2196F3', '#F44336', '#FFEB3B', '#FF9800']
+for i, (label, color) in enumerate(zip(labels, colors)):
+    ax.fill_between(x_range, cum[i-1] if i else 0, cum[i], facecolor=color, label=label, alpha=0.8)
 
 # --- Step/bracket labeling logic ---
-# Identify the indices where the marginal rate changes for step labels
-step_indices = [0]
-for i in range(1, len(total_m_rates)):
-    if abs(total_m_rates[i] - total_m_rates[i-1]) > 0.1:
-        step_indices.append(i)
-step_indices.append(len(total_m_rates)-1)  # always end
+# The sweep emits (start, mid, end) samples per constant-rate segment, so the
+# segments are read straight off x_range. Neighbouring segments with the same
+# total rate are merged into one bracket.
+seg_starts, seg_ends, seg_rates = x_range[0::3], x_range[2::3], total_m_rates[1::3]
+breaks = np.flatnonzero(np.abs(np.diff(seg_rates)) > 0.1) + 1
+first = np.concatenate(([0], breaks))  # first segment of each bracket
+last = np.concatenate((breaks, [len(seg_rates)])) - 1  # last segment of each bracket
 # For each bracket, label the middle with the marginal rate %
-for i in range(len(step_indices)-1):
-    start, end = step_indices[i], step_indices[i+1]
-    mid = (start + end) // 2
+for lo, hi, rate in zip(seg_starts[first], seg_ends[last], seg_rates[first]):
     # Only label brackets wider than 5% of the graph width
-    if (x_range[end] - x_range[start]) > (max_x * 0.05):
-        rate = total_m_rates[mid]
-        ax.text(x_range[mid], rate + 1, f"{rate:.1f}%", 
+    if (hi - lo) > (max_x * 0.05):
+        ax.text((lo + hi) / 2, rate + 1, f"{rate:.1f}%", 
                 ha='center', fontweight='bold', fontsize=9,
                 bbox=dict(facecolor='white', alpha=0.6, edgecolor='none', pad=1))
 
@@ -228,7 +416,8 @@ ax.grid(axis='y', alpha=0.3)
 # Show only the next IRMAA line, not all
 if show_irmaa:
     irmaa_list = DATA_2026[st_status]["irmaa"]  # All IRMAA thresholds
-    next_irmaa = next((tier for tier in irmaa_list if tier > wages), None)  # Smallest threshold above current wages
+    idx = bisect.bisect_right(irmaa_list, wages)  # list is sorted, so binary search for the next tier
+    next_irmaa = irmaa_list[idx] if idx < len(irmaa_list) else None  # Smallest threshold above current wages
     if next_irmaa is not None and next_irmaa <= max_x:  # Only draw if visible on the graph
         ax.axvline(next_irmaa, color='red', alpha=0.3, ls=':')
         ax.text(